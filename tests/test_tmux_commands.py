@@ -0,0 +1,155 @@
+"""Tests for the tmux command-line helpers and control-mode reply parser"""
+
+import os
+
+from tmux_commands import (
+    ControlReplyParser,
+    control_mode_argv,
+    control_session_name,
+    escape_tmux_argv,
+    is_control_session,
+    quote_tmux_arg,
+    tmux_chain_argv,
+    tmux_command_line,
+)
+
+
+# --- Quoting ---
+
+def test_quote_wraps_argument_in_single_quotes():
+    assert quote_tmux_arg("send-keys") == "'send-keys'"
+    assert quote_tmux_arg("") == "''"
+
+
+def test_quote_escapes_single_quotes():
+    assert quote_tmux_arg("it's") == "'it'\\''s'"
+    assert quote_tmux_arg("'") == "''\\'''"
+
+
+def test_quote_keeps_separators_and_newlines_inside_the_quotes():
+    assert quote_tmux_arg("a;") == "'a;'"
+    assert quote_tmux_arg(";") == "';'"
+    assert quote_tmux_arg('say "hi"\nthen $HOME') == "'say \"hi\"\nthen $HOME'"
+
+
+def test_command_line_is_one_quoted_line():
+    line = tmux_command_line(("send-keys", "-t", "work", "-l", "--", "it's done;"))
+    assert line == "'send-keys' '-t' 'work' '-l' '--' 'it'\\''s done;'\n"
+
+
+# --- Spawned command chains ---
+
+def test_escape_trailing_semicolon():
+    assert escape_tmux_argv("echo hi;") == "echo hi\\;"
+    assert escape_tmux_argv(";") == "\\;"
+
+
+def test_escape_leaves_other_arguments_alone():
+    for arg in ("echo a;b", "", "it's", 'say "hi"', "two\nlines", "x\\"):
+        assert escape_tmux_argv(arg) == arg
+
+
+def test_chain_argv_joins_commands_with_semicolons():
+    argv = tmux_chain_argv([
+        ("send-keys", "-t", "work", "-l", "--", "ls;"),
+        ("send-keys", "-t", "work", "C-m"),
+    ])
+    assert argv == [
+        "tmux",
+        "send-keys", "-t", "work", "-l", "--", "ls\\;",
+        ";",
+        "send-keys", "-t", "work", "C-m",
+    ]
+
+
+def test_chain_argv_single_command():
+    assert tmux_chain_argv([("list-sessions",)]) == ["tmux", "list-sessions"]
+
+
+# --- Control sessions ---
+
+def test_control_session_names_are_unique_and_hidden():
+    first = control_session_name("mcp")
+    second = control_session_name("mcp")
+    assert first != second
+    for name in (first, second):
+        assert f"_{os.getpid()}_" in name
+        assert is_control_session(name)
+    assert not is_control_session("work")
+    assert not is_control_session("tmux_work")
+
+
+def test_control_mode_argv_kills_its_session_on_detach():
+    argv = control_mode_argv("_tmux_mcp_control_1")
+    assert argv[:2] == ["tmux", "-C"]
+    assert "destroy-unattached" not in argv
+    assert argv[-4:] == ["-t", "_tmux_mcp_control_1", "client-detached", "kill-session -t _tmux_mcp_control_1"]
+
+
+# --- Reply parsing ---
+
+def feed(parser, text):
+    """Feed lines to parser, returning the replies it produced"""
+    replies = []
+    for line in text.splitlines():
+        reply = parser.feed(line)
+        if reply is not None:
+            replies.append(reply)
+    return replies
+
+
+def test_parser_returns_output_of_our_commands():
+    parser = ControlReplyParser()
+    assert feed(parser, (
+        "%begin 1700000000 10 1\n"
+        "first line\n"
+        "second line\n"
+        "%end 1700000000 10 1\n"
+    )) == [(True, "first line\nsecond line")]
+
+
+def test_parser_reports_errors():
+    parser = ControlReplyParser()
+    assert feed(parser, (
+        "%begin 1700000000 11 1\n"
+        "can't find pane: nosuch\n"
+        "%error 1700000000 11 1\n"
+    )) == [(False, "can't find pane: nosuch")]
+
+
+def test_parser_empty_reply():
+    parser = ControlReplyParser()
+    assert feed(parser, "%begin 1700000000 12 1\n%end 1700000000 12 1\n") == [(True, "")]
+
+
+def test_parser_skips_initial_command_and_notifications():
+    parser = ControlReplyParser()
+    assert feed(parser, (
+        "%begin 1700000000 1 0\n"
+        "%end 1700000000 1 0\n"
+        "%session-changed $1 _tmux_mcp_control_1\n"
+        "%output %1 hello\\015\\012\n"
+        "%begin 1700000000 2 1\n"
+        "ok\n"
+        "%end 1700000000 2 1\n"
+        "%window-add @3\n"
+    )) == [(True, "ok")]
+
+
+def test_parser_only_ends_a_block_on_its_own_guard():
+    parser = ControlReplyParser()
+    assert feed(parser, (
+        "%begin 1700000000 20 1\n"
+        "%end 1700000000 19 1\n"
+        "%error\n"
+        "%end 1700000000 20 1\n"
+    )) == [(True, "%end 1700000000 19 1\n%error")]
+
+
+def test_parser_keeps_state_between_lines():
+    parser = ControlReplyParser()
+    assert parser.feed("%begin 1700000000 30 1") is None
+    assert parser.feed("partial") is None
+    assert parser.feed("%end 1700000000 30 1") == (True, "partial")
+    assert parser.feed("%begin 1700000000 31 1") is None
+    assert parser.feed("%error 1700000000 31 1") == (False, "")
@@ -0,0 +1,452 @@
+"""Tests for the MCP server's helpers, send queue and control-mode client"""
+
+import asyncio
+import json
+import logging
+import subprocess
+import time
+import types
+from datetime import datetime
+
+import pytest
+
+import tmux_mcp_server as server
+
+
+@pytest.fixture
+def chains(monkeypatch):
+    """Record the command chains the send queue runs instead of calling tmux"""
+    sent = []
+
+    async def run_chain(commands, capture_output=True, start_control=True):
+        sent.append([tuple(command) for command in commands])
+        await asyncio.sleep(0.01)
+        return True, ""
+
+    monkeypatch.setattr(server, "_run_tmux_chain", run_chain)
+    return sent
+
+
+async def wait_for_chains(chains, count):
+    while len(chains) < count:
+        await asyncio.sleep(0)
+
+
+# --- Resource serialization ---
+
+@pytest.fixture
+def debug_logging():
+    level = server.logger.level
+    server.logger.setLevel(logging.DEBUG)
+    yield
+    server.logger.setLevel(level)
+
+
+PAYLOAD = {"sessions": [{"name": "work", "windows": 1}], "count": 1}
+
+
+@pytest.fixture
+def with_orjson(monkeypatch):
+    orjson = pytest.importorskip("orjson")
+    monkeypatch.setattr(server, "orjson", orjson, raising=False)
+    monkeypatch.setattr(server, "HAS_ORJSON", True)
+
+
+def test_dumps_with_orjson_is_compact(with_orjson):
+    assert server._dumps(PAYLOAD) == '{"sessions":[{"name":"work","windows":1}],"count":1}'
+
+
+def test_dumps_with_orjson_indents_when_debugging(with_orjson, debug_logging):
+    assert server._dumps(PAYLOAD) == json.dumps(PAYLOAD, indent=2)
+
+
+def test_dumps_without_orjson_is_compact(monkeypatch):
+    monkeypatch.setattr(server, "HAS_ORJSON", False)
+    assert server._dumps(PAYLOAD) == '{"sessions":[{"name":"work","windows":1}],"count":1}'
+
+
+def test_dumps_without_orjson_indents_when_debugging(monkeypatch, debug_logging):
+    monkeypatch.setattr(server, "HAS_ORJSON", False)
+    assert server._dumps(PAYLOAD) == json.dumps(PAYLOAD, indent=2)
+
+
+# --- Task registries ---
+
+@pytest.mark.asyncio
+async def test_finished_task_leaves_its_registry():
+    registry = {}
+    task = asyncio.ensure_future(asyncio.sleep(0))
+    server._track_task(registry, "work", task)
+    assert registry == {"work": task}
+
+    await task
+    await asyncio.sleep(0)
+
+    assert registry == {}
+
+
+@pytest.mark.asyncio
+async def test_replaced_task_finishing_keeps_its_replacement():
+    registry = {}
+    old = asyncio.ensure_future(asyncio.sleep(10))
+    new = asyncio.ensure_future(asyncio.sleep(10))
+    server._track_task(registry, "work", old)
+    server._track_task(registry, "work", new)
+
+    await server._cancel_task(old)
+    await asyncio.sleep(0)
+
+    assert registry == {"work": new}
+    await server._cancel_task(new)
+    await asyncio.sleep(0)
+    assert registry == {}
+
+
+# --- Session name validation ---
+
+@pytest.mark.parametrize("name", ["work", "my session", "dev-2.1", "café"])
+def test_usable_session_names_are_accepted(name):
+    server._validate_session_name(name)
+
+
+@pytest.mark.parametrize("name", ["", "   ", "two\nlines", "nul\x00", "tab\there", "del\x7f"])
+def test_unusable_session_names_are_rejected(name):
+    with pytest.raises(ValueError):
+        server._validate_session_name(name)
+
+
+# --- Timestamps ---
+
+def test_now_iso_is_reused_within_a_second(monkeypatch):
+    now = [1700000000.2]
+    monkeypatch.setattr(server, "time", types.SimpleNamespace(time=lambda: now[0]))
+    monkeypatch.setattr(server, "_now_iso_cache", (0, ""))
+
+    first = server._now_iso()
+    assert first == datetime.fromtimestamp(1700000000).isoformat()
+
+    now[0] = 1700000000.9
+    assert server._now_iso() is first
+
+    now[0] = 1700000001.0
+    assert server._now_iso() == datetime.fromtimestamp(1700000001).isoformat()
+
+
+# --- Session listing ---
+
+@pytest.mark.asyncio
+async def test_query_sessions_parses_fields_and_hides_control_sessions(monkeypatch):
+    calls = []
+
+    async def run_tmux(*args, start_control=True):
+        calls.append((args, start_control))
+        return True, (
+            "work\t1700000000\t3\t1\n"
+            "tab\tname\t1700000060\t1\t0\n"
+            "_tmux_mcp_control_1234_1\t1700000120\t1\t0\n"
+        )
+
+    monkeypatch.setattr(server, "_run_tmux", run_tmux)
+
+    sessions = await server._query_sessions()
+
+    # Listing never starts the control connection (or a tmux server)
+    assert calls == [(("list-sessions", "-F", server.SESSION_FORMAT), False)]
+    assert sessions == [
+        {
+            "name": "work",
+            "windows": 3,
+            "attached": 1,
+            "created": datetime.fromtimestamp(1700000000).isoformat()
+        },
+        {
+            "name": "tab\tname",
+            "windows": 1,
+            "attached": 0,
+            "created": datetime.fromtimestamp(1700000060).isoformat()
+        },
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("result", [
+    (False, "no server running on /tmp/tmux-1000/default"),
+    (True, ""),
+    (True, "_tmux_messenger_control_1234_1\t1700000000\t1\t0\n"),
+])
+async def test_query_sessions_returns_none_without_sessions(monkeypatch, result):
+    async def run_tmux(*args, start_control=True):
+        return result
+
+    monkeypatch.setattr(server, "_run_tmux", run_tmux)
+
+    assert await server._query_sessions() is None
+
+
+# --- Send queue ---
+
+@pytest.mark.asyncio
+async def test_concurrent_sends_to_a_session_are_chained_in_order(chains):
+    results = await asyncio.gather(
+        server._send_keys("work", "one"),
+        server._send_text("work", "two", "Enter"),
+        server._send_keys("work", "three"),
+    )
+
+    assert results == [(True, "")] * 3
+    assert chains == [[
+        ("send-keys", "-t", "work", "one"),
+        ("send-keys", "-t", "work", "-l", "--", "two"),
+        ("send-keys", "-t", "work", "Enter"),
+        ("send-keys", "-t", "work", "three"),
+    ]]
+
+
+@pytest.mark.asyncio
+async def test_each_session_gets_its_own_chain(chains):
+    await asyncio.gather(
+        server._send_keys("a", "1"),
+        server._send_keys("b", "1"),
+        server._send_keys("a", "2"),
+    )
+
+    assert sorted(chains) == [
+        [("send-keys", "-t", "a", "1"), ("send-keys", "-t", "a", "2")],
+        [("send-keys", "-t", "b", "1")],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_sends_queued_during_a_batch_follow_it_in_order(chains):
+    first = asyncio.ensure_future(server._send_keys("work", "one"))
+    await wait_for_chains(chains, 1)
+
+    await asyncio.gather(
+        server._send_keys("work", "two"),
+        server._send_keys("work", "three"),
+        first,
+    )
+
+    assert chains == [
+        [("send-keys", "-t", "work", "one")],
+        [("send-keys", "-t", "work", "two"), ("send-keys", "-t", "work", "three")],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_failed_chain_fails_every_send_in_it(monkeypatch):
+    async def run_chain(commands, capture_output=True, start_control=True):
+        return False, "can't find session: gone"
+
+    monkeypatch.setattr(server, "_run_tmux_chain", run_chain)
+    monkeypatch.setattr(server, "_session_snapshot", (time.monotonic(), []))
+
+    results = await asyncio.gather(
+        server._send_keys("gone", "one"),
+        server._send_keys("gone", "two"),
+    )
+
+    assert results == [(False, "can't find session: gone")] * 2
+    assert server._session_snapshot is None
+
+
+@pytest.mark.asyncio
+async def test_hung_tmux_fails_the_send_instead_of_stalling_the_queue(monkeypatch):
+    class NoControl:
+        async def run(self, commands, start=True):
+            return None
+
+    def run(argv, **kwargs):
+        raise subprocess.TimeoutExpired(argv, kwargs["timeout"])
+
+    server._bind_loop_state()
+    monkeypatch.setattr(server, "tmux_control", NoControl())
+    monkeypatch.setattr(server.subprocess, "run", run)
+
+    ok, error = await asyncio.wait_for(server._send_keys("stuck", "x"), 1)
+
+    assert not ok
+    assert "did not finish" in error
+
+
+# --- Cancellation ---
+
+@pytest.mark.asyncio
+async def test_cancelled_send_still_queued_is_dropped(chains):
+    first = asyncio.ensure_future(server._send_keys("work", "one"))
+    await wait_for_chains(chains, 1)
+    second = asyncio.ensure_future(server._send_keys("work", "two"))
+    await asyncio.sleep(0)
+
+    await server._cancel_task(second)
+    assert await first == (True, "")
+    await asyncio.sleep(0.05)
+
+    assert second.cancelled()
+    assert chains == [[("send-keys", "-t", "work", "one")]]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_send_in_flight_finishes_before_cancel_returns(monkeypatch):
+    finished = []
+
+    async def run_chain(commands, capture_output=True, start_control=True):
+        await asyncio.sleep(0.05)
+        finished.append(commands)
+        return True, ""
+
+    monkeypatch.setattr(server, "_run_tmux_chain", run_chain)
+    task = asyncio.ensure_future(server._send_keys("work", "one"))
+    await asyncio.sleep(0.01)
+
+    await server._cancel_task(task)
+
+    assert task.cancelled()
+    assert len(finished) == 1
+
+
+# --- Control mode ---
+
+@pytest.mark.asyncio
+async def test_commands_the_control_connection_lost_are_spawned(monkeypatch):
+    class LostControl:
+        async def run(self, commands, start=True):
+            return [(True, "")] + [None] * (len(commands) - 1)
+
+    spawned = []
+
+    def run(argv, **kwargs):
+        spawned.append(argv)
+        return subprocess.CompletedProcess(argv, 0, stdout=None, stderr=b"")
+
+    server._bind_loop_state()
+    monkeypatch.setattr(server, "tmux_control", LostControl())
+    monkeypatch.setattr(server.subprocess, "run", run)
+
+    result = await server._run_tmux_chain(
+        [("send-keys", "-t", "work", "one"), ("send-keys", "-t", "work", "two;")],
+        capture_output=False
+    )
+
+    assert result == (True, "")
+    assert spawned == [["tmux", "send-keys", "-t", "work", "two\\;"]]
+
+
+@pytest.mark.asyncio
+async def test_reader_answers_pending_commands_in_order():
+    client = server.TmuxControlClient()
+    loop = asyncio.get_running_loop()
+    answered = loop.create_future()
+    failed = loop.create_future()
+    lost = loop.create_future()
+    client._pending.extend([answered, failed, lost])
+
+    stdout = asyncio.StreamReader()
+    stdout.feed_data(
+        b"%begin 1700000000 1 0\n"
+        b"%end 1700000000 1 0\n"
+        b"%begin 1700000000 2 1\n"
+        b"out\n"
+        b"%end 1700000000 2 1\n"
+        b"%output %1 x\n"
+        b"%begin 1700000000 3 1\n"
+        b"can't find pane: nosuch\n"
+        b"%error 1700000000 3 1\n"
+    )
+    stdout.feed_eof()
+
+    async def wait():
+        return 0
+
+    await client._read_loop(types.SimpleNamespace(stdout=stdout, returncode=0, wait=wait))
+
+    assert answered.result() == (True, "out")
+    assert failed.result() == (False, "can't find pane: nosuch")
+    # The connection closed first, so the caller falls back to spawning tmux
+    assert lost.result() is None
+
+
+@pytest.mark.asyncio
+async def test_commands_queued_together_share_a_write_and_wait_for_its_drain():
+    class Stdin:
+        def __init__(self):
+            self.writes = []
+            self.drained = asyncio.Event()
+
+        def write(self, data):
+            self.writes.append(data)
+
+        async def drain(self):
+            await self.drained.wait()
+
+    client = server.TmuxControlClient()
+    stdin = Stdin()
+    client._proc = types.SimpleNamespace(stdin=stdin)
+
+    first = asyncio.ensure_future(client.run([("display-message", "-p", "a")], start=False))
+    second = asyncio.ensure_future(client.run([("send-keys", "-t", "work", "b;")], start=False))
+    await asyncio.sleep(0.01)
+
+    assert stdin.writes == [b"'display-message' '-p' 'a'\n'send-keys' '-t' 'work' 'b;'\n"]
+
+    # Replies alone don't release the callers while the write is draining
+    for reply in [(True, "a"), (True, "")]:
+        client._pending.popleft().set_result(reply)
+    await asyncio.sleep(0.01)
+    assert not first.done() and not second.done()
+
+    stdin.drained.set()
+    assert await first == [(True, "a")]
+    assert await second == [(True, "")]
+
+
+# --- Event loop changes ---
+
+def test_loop_state_is_recreated_on_each_event_loop(chains, monkeypatch):
+    async def query_sessions():
+        await asyncio.sleep(0.01)
+        return [{"name": "work"}]
+
+    async def use_state():
+        # Concurrent refreshes contend for the snapshot lock
+        listed = await asyncio.gather(server._list_sessions(0), server._list_sessions(0))
+        sent = await asyncio.gather(server._send_keys("work", "x"), server._send_keys("work", "y"))
+        return listed, sent
+
+    monkeypatch.setattr(server, "_query_sessions", query_sessions)
+    for _ in range(2):
+        listed, sent = asyncio.run(asyncio.wait_for(use_state(), 1))
+        assert listed == [[{"name": "work"}]] * 2
+        assert sent == [(True, "")] * 2
+
+    assert len(chains) == 2
+
+
+def test_loop_change_disconnects_the_old_control_client(monkeypatch):
+    closed = []
+    old_loop = asyncio.new_event_loop()
+    old = server.TmuxControlClient()
+    old._reader = old_loop.create_future()
+    old._proc = types.SimpleNamespace(
+        pid=4321,
+        stdin=types.SimpleNamespace(
+            get_extra_info=lambda name: types.SimpleNamespace(close=lambda: closed.append(name))
+        )
+    )
+    old_loop.close()
+
+    async def bind():
+        server._bind_loop_state()
+        return server.tmux_control
+
+    monkeypatch.setattr(server, "tmux_control", old)
+    server._sends_in_flight.add(old_loop.create_future())
+    new = asyncio.run(bind())
+
+    # The old loop is closed, so its stdin pipe is closed directly
+    assert closed == ["pipe"]
+    assert old._proc is None
+    assert new is not old
+    assert new._previous_pid == 4321
+    assert new.session_name != old.session_name
+    assert not server._sends_in_flight
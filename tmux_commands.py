@@ -0,0 +1,129 @@
+"""
+tmux command-line helpers shared by the MCP server and the GUIs
+
+Builds argument lists for running tmux directly, command lines for tmux
+control mode (`tmux -C`), and parses the replies control mode sends back.
+"""
+
+import itertools
+import os
+from typing import List, Optional, Sequence, Tuple
+
+# Hidden control-mode sessions are named with this prefix, so every program
+# can leave all of them (not just its own) out of session listings
+CONTROL_SESSION_PREFIX = "_tmux_"
+
+# Numbers the control sessions created by this process
+_control_session_ids = itertools.count(1)
+
+# list-sessions format used by the GUIs: the session name, a tab, then the
+# line shown in the listbox (tmux's default list-sessions output)
+LISTBOX_SESSION_FORMAT = (
+    '#{session_name}\t'
+    '#{session_name}: #{session_windows} windows (created #{t:session_created})'
+    '#{?session_attached, (attached),}'
+)
+
+
+def quote_tmux_arg(arg: str) -> str:
+    """Quote an argument for tmux's command parser (shell-style single quotes)"""
+    return "'" + arg.replace("'", "'\\''") + "'"
+
+
+def escape_tmux_argv(arg: str) -> str:
+    """Keep a trailing ';' from being parsed as a tmux command separator"""
+    return arg[:-1] + '\\;' if arg.endswith(';') else arg
+
+
+def message_commands(session_name: str, message: str) -> Tuple[Tuple[str, ...], ...]:
+    """send-keys commands that type message literally into a session and press Enter (C-m)"""
+    return (
+        ('send-keys', '-t', session_name, '-l', '--', message),
+        ('send-keys', '-t', session_name, 'C-m'),
+    )
+
+
+def tmux_command_line(command: Sequence[str]) -> str:
+    """A command as one line for tmux control mode"""
+    return ' '.join(quote_tmux_arg(a) for a in command) + '\n'
+
+
+def tmux_chain_argv(commands: Sequence[Sequence[str]]) -> List[str]:
+    """argv running commands as a single tmux invocation, chained with ';'"""
+    argv = ['tmux']
+    for command in commands:
+        if len(argv) > 1:
+            argv.append(';')
+        argv.extend(escape_tmux_argv(arg) for arg in command)
+    return argv
+
+
+def control_session_name(client: str) -> str:
+    """
+    Name of the hidden session for a new control-mode client
+    
+    The name includes the process id and a per-process counter, so separate
+    server or GUI instances, or a client and the one replacing it, never
+    share a session and one exiting can't kill another's.
+    """
+    return f"{CONTROL_SESSION_PREFIX}{client}_control_{os.getpid()}_{next(_control_session_ids)}"
+
+
+def is_control_session(session_name: str) -> bool:
+    """Whether a session is the hidden session of some control-mode client"""
+    return session_name.startswith(CONTROL_SESSION_PREFIX)
+
+
+def control_mode_argv(session_name: str) -> List[str]:
+    """
+    argv for a tmux control-mode client attached to its own session
+    
+    A client-detached hook kills the session once the client disconnects.
+    destroy-unattached can't be used for this: tmux doesn't count control
+    clients as attached, so it destroys the session under the live client,
+    which can crash the tmux server when that client later exits.
+    """
+    return [
+        'tmux', '-C',
+        'new-session', '-A', '-s', session_name, ';',
+        'set-hook', '-t', session_name, 'client-detached', f'kill-session -t {session_name}'
+    ]
+
+
+class ControlReplyParser:
+    """
+    Incremental parser for the output of a tmux control-mode client
+    
+    tmux answers each command with a %begin ... %end (or %error) block whose
+    guard lines carry the same time, command number and flags. Anything
+    outside a block is a notification and is ignored.
+    """
+    
+    def __init__(self) -> None:
+        self._guard: List[str] = []
+        self._output: Optional[List[str]] = None
+    
+    def feed(self, line: str) -> Optional[Tuple[bool, str]]:
+        """
+        Consume one line of output, without its trailing newline
+        
+        Returns (success, output) when the line ends the reply to a command
+        this client sent, otherwise None.
+        """
+        if self._output is None:
+            if line.startswith('%begin '):
+                self._guard = line.split(' ')[1:]
+                self._output = []
+            return None
+        
+        fields = line.split(' ')
+        if fields[0] not in ('%end', '%error') or fields[1:] != self._guard:
+            self._output.append(line)
+            return None
+        
+        output, self._output = self._output, None
+        # Flag 1 marks replies to commands this client sent; the command the
+        # client was started with is reported with flag 0
+        if self._guard[-1] != '1':
+            return None
+        return fields[0] == '%end', '\n'.join(output)
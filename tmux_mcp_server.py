@@ -5,16 +5,37 @@ Provides tools and resources for managing tmux sessions via MCP
 """
 
 import asyncio
+import functools
 import json
+import subprocess
 import sys
 import logging
-from typing import Any, Dict, List, Optional
+import os
+import re
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence, Set, Tuple
 from datetime import datetime
 
+try:
+    import orjson  # Optional: faster JSON encoding for resources
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
 from mcp.server.fastmcp import FastMCP, Context
 from mcp.server.fastmcp.prompts import base
 import mcp.types as types
 
+from tmux_commands import (
+    ControlReplyParser,
+    control_mode_argv,
+    control_session_name,
+    is_control_session,
+    tmux_chain_argv,
+    tmux_command_line,
+)
+
 # Set up logging to stderr (important for MCP stdio servers)
 logging.basicConfig(
     level=logging.INFO,
@@ -37,6 +58,588 @@ mcp = FastMCP(
 active_timers: Dict[str, asyncio.Task] = {}
 active_cycles: Dict[str, asyncio.Task] = {}
 
+# Last parsed `tmux list-sessions` result as (monotonic time, sessions), so
+# tools and resources called back-to-back share one snapshot
+SESSION_SNAPSHOT_MAX_AGE = 0.5
+_session_snapshot: Optional[Tuple[float, Optional[List[Dict[str, Any]]]]] = None
+_session_snapshot_lock: Optional[asyncio.Lock] = None
+
+# Queued sends as (session, tmux commands, result future); see _queue_send
+_SendItem = Tuple[str, List[Tuple[str, ...]], "asyncio.Future[Tuple[bool, str]]"]
+SEND_BATCH_MAX = 64
+# Seconds a spawned tmux may take to deliver sends before they are reported
+# as failed; the queue waits on it, so a hung tmux would stall every session
+SEND_TIMEOUT = 5.0
+_send_queue: "Optional[asyncio.Queue[_SendItem]]" = None
+_send_drainer: "Optional[asyncio.Task[None]]" = None
+# Result futures of the sends _flush_sends is currently running
+_sends_in_flight: "Set[asyncio.Future[Tuple[bool, str]]]" = set()
+
+# Event loop that the queue, lock and tasks above and the control client
+# belong to; see _bind_loop_state
+_state_loop: Optional[asyncio.AbstractEventLoop] = None
+
+# (epoch second, ISO timestamp) last produced by _now_iso
+_now_iso_cache: Tuple[int, str] = (0, "")
+
+# Control characters can't appear in a tmux target; a newline would also
+# split a control-mode command line
+_INVALID_SESSION_RE = re.compile(r'[\x00-\x1f\x7f]')
+
+# Tab-separated fields requested from `tmux list-sessions -F`
+SESSION_FORMAT = '#{session_name}\t#{session_created}\t#{session_windows}\t#{session_attached}'
+
+# Map agent names to the commands that launch them
+_AGENT_COMMANDS: Dict[str, str] = {
+    "gemini": "gemini",
+    "claude": "claude",
+    "codex": "codex",
+    "swarm": "swarmcode"
+}
+_AGENT_LIST_STR = ", ".join(_AGENT_COMMANDS)
+
+
+# --- tmux control mode ---
+
+class TmuxControlClient:
+    """
+    Persistent tmux control-mode (`tmux -C`) connection
+    
+    Commands are written one per line to the control client's stdin and
+    tmux answers each with a %begin ... %end (or %error) block on stdout, in
+    the order they were sent. This avoids forking a new tmux client for
+    every command.
+    
+    The client attaches to a dedicated session (hidden from session
+    listings) that is killed when the control client disconnects, so it
+    never outlives the server; see control_mode_argv.
+    """
+    
+    def __init__(self, previous_pid: Optional[int] = None) -> None:
+        self.session_name = control_session_name("mcp")
+        # Process id of a replaced client that may still be exiting
+        self._previous_pid = previous_pid
+        self._proc: Optional[asyncio.subprocess.Process] = None
+        self._reader: Optional["asyncio.Task[None]"] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+        # Resolved with None for commands whose reply is lost because the
+        # connection closed
+        self._pending: Deque["asyncio.Future[Optional[Tuple[bool, str]]]"] = deque()
+        # Command lines queued during this event loop iteration; written to
+        # tmux with a single write() by _flush
+        self._outbox: List[bytes] = []
+        self._flushing: Optional["asyncio.Task[None]"] = None
+        # Serializes _flush writes and drains
+        self._write_lock: Optional[asyncio.Lock] = None
+    
+    def close(self) -> Optional[int]:
+        """
+        Disconnect a client left running by an event loop no longer in use
+        
+        Closes tmux's stdin without waiting for it to exit; tmux -C then
+        detaches and exits on its own. Returns the process id of the client
+        if it was running, for the replacement client to wait on.
+        """
+        proc, self._proc = self._proc, None
+        if proc is None or proc.stdin is None or self._reader is None:
+            return None
+        
+        loop = self._reader.get_loop()
+        if loop.is_closed():
+            # The pipe transport can't be used without its loop
+            proc.stdin.get_extra_info('pipe').close()
+        else:
+            loop.call_soon_threadsafe(proc.stdin.close)
+        return proc.pid
+    
+    async def run(
+        self,
+        commands: Sequence[Sequence[str]],
+        start: bool = True
+    ) -> Optional[List[Optional[Tuple[bool, str]]]]:
+        """
+        Run tmux commands over the control connection
+        
+        Commands are queued and flushed together with those of any other
+        caller in the same event loop iteration, then their replies are
+        awaited, so they are pipelined. Callers wait for the write to drain
+        before waiting for replies, so a burst of commands is held back by
+        the pipe rather than buffered without limit.
+        
+        Returns one (success, output) pair per command, where output is the
+        error message on failure. Commands still unanswered when the
+        connection closes get None instead; these are always the last ones.
+        Returns None if the control connection is unavailable, or not open
+        yet and start is False. In both cases the caller should spawn tmux
+        directly.
+        """
+        # Control mode reads one command per line
+        if any('\n' in arg for command in commands for arg in command):
+            return None
+        
+        proc = await self._ensure_started() if start else self._proc
+        if proc is None:
+            return None
+        
+        # Queue lines and futures without yielding so replies stay in order;
+        # the first caller in this loop iteration starts the flush
+        loop = asyncio.get_running_loop()
+        flushing = self._flushing
+        if flushing is None or not self._outbox:
+            flushing = self._flushing = asyncio.ensure_future(self._flush())
+        futures: List["asyncio.Future[Optional[Tuple[bool, str]]]"] = []
+        for command in commands:
+            future: "asyncio.Future[Optional[Tuple[bool, str]]]" = loop.create_future()
+            self._pending.append(future)
+            futures.append(future)
+            self._outbox.append(tmux_command_line(command).encode())
+        
+        try:
+            # Shared by every caller in the batch, so one being cancelled
+            # doesn't stop the write for the others
+            await asyncio.shield(flushing)
+        except ConnectionError:
+            # tmux exited; the reader resolves the unanswered commands
+            pass
+        return list(await asyncio.gather(*futures))
+    
+    async def _flush(self) -> None:
+        """Write the command lines queued during one loop iteration and wait for them to drain"""
+        data = b''.join(self._outbox)
+        self._outbox.clear()
+        proc = self._proc
+        # If tmux exited, the reader has already given up on the queued commands
+        if not data or proc is None or proc.stdin is None:
+            return
+        
+        # One batch at a time, in order: before Python 3.10 drain() can't
+        # be awaited by two tasks at once
+        if self._write_lock is None:
+            self._write_lock = asyncio.Lock()
+        async with self._write_lock:
+            proc.stdin.write(data)
+            await proc.stdin.drain()
+    
+    async def _ensure_started(self) -> Optional[asyncio.subprocess.Process]:
+        if self._proc is not None:
+            return self._proc
+        
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._proc is None:
+                await self._start()
+        return self._proc
+    
+    async def _start(self) -> None:
+        if self._previous_pid is not None:
+            await self._wait_for_previous()
+        
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *control_mode_argv(self.session_name),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+                limit=2 ** 20  # %output notifications can carry long lines
+            )
+        except OSError as e:
+            logger.warning(f"tmux control mode unavailable: {e}")
+            return
+        
+        self._proc = proc
+        self._reader = asyncio.create_task(self._read_loop(proc))
+        logger.info("Connected to tmux in control mode")
+    
+    async def _wait_for_previous(self, timeout: float = 1.0) -> None:
+        """
+        Give the client this one replaced up to timeout seconds to exit
+        
+        A tmux 3.3 server can crash when a control client connects while
+        another one is exiting.
+        """
+        pid, self._previous_pid = self._previous_pid, None
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                return
+            await asyncio.sleep(0.01)
+    
+    async def _read_loop(self, proc: asyncio.subprocess.Process) -> None:
+        assert proc.stdout is not None
+        parser = ControlReplyParser()
+        
+        try:
+            while True:
+                raw = await proc.stdout.readline()
+                if not raw:
+                    break
+                
+                reply = parser.feed(raw.decode(errors='replace').rstrip('\n'))
+                if reply is not None and self._pending:
+                    future = self._pending.popleft()
+                    if not future.done():
+                        future.set_result(reply)
+        except Exception as e:
+            logger.error(f"tmux control mode read error: {e}")
+        finally:
+            if self._proc is proc:
+                self._proc = None
+                self._outbox.clear()
+            # Let callers fall back to spawning tmux for unanswered commands
+            while self._pending:
+                future = self._pending.popleft()
+                if not future.done():
+                    future.set_result(None)
+            if proc.returncode is None:
+                # tmux -C exits when its stdin closes; killing it instead
+                # can crash the tmux server (see _wait_for_previous)
+                if proc.stdin is not None:
+                    proc.stdin.close()
+                try:
+                    await asyncio.wait_for(proc.wait(), 1.0)
+                except asyncio.TimeoutError:
+                    proc.kill()
+            await proc.wait()
+            logger.info("tmux control mode connection closed")
+
+
+tmux_control = TmuxControlClient()
+
+
+# --- Helpers ---
+
+def _bind_loop_state() -> None:
+    """
+    Drop asyncio state that was created on a different event loop
+    
+    Queues, locks, tasks and subprocess pipes only work on the loop that
+    created them. When this runs on a new loop (the server being restarted
+    in the same process, or one loop per test), the send queue, snapshot lock
+    and control connection are recreated on it instead of being reused.
+    
+    The old control client is disconnected rather than left running, and
+    its replacement waits for it to exit before connecting. The replacement
+    attaches to a session of its own, so the old client's session being
+    killed as it exits can't take the new one with it.
+    """
+    global _state_loop, _send_queue, _send_drainer, _session_snapshot_lock, tmux_control
+    
+    loop = asyncio.get_running_loop()
+    if loop is _state_loop:
+        return
+    
+    _state_loop = loop
+    _send_queue = None
+    _send_drainer = None
+    _session_snapshot_lock = None
+    # Sends the old loop's drainer was running will never finish here
+    _sends_in_flight.clear()
+    tmux_control = TmuxControlClient(previous_pid=tmux_control.close())
+
+
+def _validate_session_name(session_name: str) -> None:
+    """
+    Reject session names tmux can never match, before spawning anything
+    
+    Raises ValueError for an empty name or one containing control characters
+    """
+    if not session_name.strip():
+        raise ValueError("Session name must not be empty")
+    if _INVALID_SESSION_RE.search(session_name):
+        raise ValueError(f"Invalid session name: {session_name!r}")
+
+
+def _track_task(
+    registry: Dict[str, asyncio.Task],
+    session_name: str,
+    task: asyncio.Task
+) -> None:
+    """
+    Store a session's background task and drop it from the registry when it
+    finishes, so loops that exit on an error don't linger in the map
+    """
+    registry[session_name] = task
+    
+    def _remove(done: asyncio.Task) -> None:
+        # A newer task may have replaced this one for the same session
+        if registry.get(session_name) is done:
+            del registry[session_name]
+    
+    task.add_done_callback(_remove)
+
+
+async def _cancel_task(task: asyncio.Task, timeout: float = 1.0) -> None:
+    """Cancel a background task and give it up to timeout seconds to unwind"""
+    task.cancel()
+    await asyncio.wait({task}, timeout=timeout)
+
+
+def _now_iso() -> str:
+    """Current local time in ISO 8601, cached at one-second resolution"""
+    global _now_iso_cache
+    
+    second = int(time.time())
+    if _now_iso_cache[0] != second:
+        _now_iso_cache = (second, datetime.fromtimestamp(second).isoformat())
+    return _now_iso_cache[1]
+
+
+def _dumps(payload: Dict[str, Any]) -> str:
+    """
+    Serialize a resource payload, using orjson when it is installed
+    
+    Output is compact; it is only indented when debug logging is enabled.
+    """
+    pretty = logger.isEnabledFor(logging.DEBUG)
+    if HAS_ORJSON:
+        return orjson.dumps(payload, option=orjson.OPT_INDENT_2 if pretty else 0).decode()
+    if pretty:
+        return json.dumps(payload, indent=2)
+    return json.dumps(payload, separators=(',', ':'))
+
+
+async def _run_tmux(*args: str, start_control: bool = True) -> Tuple[bool, str]:
+    """
+    Run one tmux command, preferring the shared control-mode connection
+    
+    Returns (success, output), where output is the error message on failure
+    """
+    return await _run_tmux_chain([args], start_control=start_control)
+
+
+async def _run_tmux_chain(
+    commands: Sequence[Sequence[str]],
+    capture_output: bool = True,
+    start_control: bool = True
+) -> Tuple[bool, str]:
+    """
+    Run tmux commands in order as one unit
+    
+    Over the control connection the commands are pipelined; otherwise, or
+    for any the connection closed before answering, they are joined with ';'
+    into a single tmux process. Pass capture_output=False for commands whose
+    output is not needed (send-keys) so the fallback runs tmux on a worker
+    thread with only a stderr pipe, killed after SEND_TIMEOUT seconds. Pass
+    start_control=False to use the control connection only if it is already
+    open. Returns the result of the last command, or the first failure.
+    """
+    _bind_loop_state()
+    results = await tmux_control.run(commands, start=start_control)
+    answered = [result for result in results or () if result is not None]
+    for ok, output in answered:
+        if not ok:
+            return False, output
+    if len(answered) == len(commands):
+        return answered[-1]
+    
+    argv = tmux_chain_argv(commands[len(answered):])
+    
+    if not capture_output:
+        # Blocking run on the default executor: no asyncio transport or
+        # child watcher is set up for a command whose output we discard
+        try:
+            completed = await asyncio.get_running_loop().run_in_executor(
+                None,
+                functools.partial(
+                    subprocess.run, argv,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE,
+                    timeout=SEND_TIMEOUT
+                )
+            )
+        except subprocess.TimeoutExpired:
+            return False, f"tmux did not finish within {SEND_TIMEOUT:g} seconds"
+        
+        if completed.returncode != 0:
+            return False, completed.stderr.decode().strip()
+        return True, ""
+    
+    proc = await asyncio.create_subprocess_exec(
+        *argv,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await proc.communicate()
+    except asyncio.CancelledError:
+        # Don't leave the tmux client running after our caller is gone
+        proc.kill()
+        await proc.wait()
+        raise
+    
+    if proc.returncode != 0:
+        return False, stderr.decode().strip()
+    return True, stdout.decode()
+
+
+async def _list_sessions(
+    max_age: float = SESSION_SNAPSHOT_MAX_AGE
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Get the parsed `tmux list-sessions` output
+    
+    The parsed result is reused for up to max_age seconds; pass 0 to force
+    a fresh query.
+    
+    Returns None when tmux reports no sessions (or no server is running)
+    """
+    global _session_snapshot, _session_snapshot_lock
+    
+    _bind_loop_state()
+    snapshot = _session_snapshot
+    if snapshot is not None and time.monotonic() - snapshot[0] < max_age:
+        return snapshot[1]
+    
+    # Concurrent callers wait for one refresh instead of each querying tmux
+    if _session_snapshot_lock is None:
+        _session_snapshot_lock = asyncio.Lock()
+    async with _session_snapshot_lock:
+        snapshot = _session_snapshot
+        if snapshot is not None and time.monotonic() - snapshot[0] < max_age:
+            return snapshot[1]
+        
+        taken_at = time.monotonic()
+        sessions = await _query_sessions()
+        _session_snapshot = (taken_at, sessions)
+        return sessions
+
+
+async def _query_sessions() -> Optional[List[Dict[str, Any]]]:
+    """
+    Run `tmux list-sessions` and parse its output
+    
+    The control connection is only used if a send has already opened it;
+    connecting just to list sessions would start a tmux server when none is
+    running.
+    """
+    ok, output = await _run_tmux('list-sessions', '-F', SESSION_FORMAT, start_control=False)
+    if not ok:
+        return None
+    
+    # Split from the right so a tab in a session name stays intact
+    rows = (line.rsplit('\t', 3) for line in output.splitlines())
+    sessions = [
+        {
+            "name": name,
+            "windows": int(windows),
+            "attached": int(attached),
+            "created": datetime.fromtimestamp(int(created)).isoformat()
+        }
+        for name, created, windows, attached in rows
+        if not is_control_session(name)
+    ]
+    return sessions or None
+
+
+async def _send_keys(session_name: str, *keys: str) -> Tuple[bool, str]:
+    """
+    Send keys to a tmux session with one `tmux send-keys` command
+    
+    The command goes through the send queue, so concurrent sends to the
+    same session are coalesced into one tmux call.
+    
+    Returns (success, error message)
+    """
+    return await _queue_send(session_name, [('send-keys', '-t', session_name, *keys)])
+
+
+async def _send_text(session_name: str, text: str, *keys: str) -> Tuple[bool, str]:
+    """
+    Type text into a tmux session, then send any extra keys
+    
+    The text is sent with `send-keys -l`, so a message containing key names
+    such as 'Enter' or 'C-c' is typed as-is rather than interpreted.
+    
+    Returns (success, error message)
+    """
+    commands = [('send-keys', '-t', session_name, '-l', '--', text)]
+    if keys:
+        commands.append(('send-keys', '-t', session_name, *keys))
+    return await _queue_send(session_name, commands)
+
+
+async def _queue_send(
+    session_name: str,
+    commands: List[Tuple[str, ...]]
+) -> Tuple[bool, str]:
+    """
+    Queue tmux commands that act on one session and wait for their result
+    
+    Everything queued for the same session by the time the drain loop picks
+    up a batch is sent as one tmux command chain.
+    
+    If the caller is cancelled, a send that is still queued is dropped and
+    one already running is waited for, so nothing is sent on behalf of a
+    cancelled task after it has finished.
+    """
+    global _send_queue, _send_drainer
+    
+    _bind_loop_state()
+    if _send_queue is None:
+        _send_queue = asyncio.Queue()
+    if _send_drainer is None or _send_drainer.done():
+        _send_drainer = asyncio.create_task(_drain_sends(_send_queue))
+    
+    future: "asyncio.Future[Tuple[bool, str]]" = asyncio.get_running_loop().create_future()
+    _send_queue.put_nowait((session_name, commands, future))
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        if future in _sends_in_flight:
+            await asyncio.wait({future})
+        else:
+            # _flush_sends skips sends whose future is already done
+            future.cancel()
+        raise
+
+
+async def _drain_sends(queue: "asyncio.Queue[_SendItem]") -> None:
+    """Issue queued sends in batches, one command chain per target session"""
+    while True:
+        batch = [await queue.get()]
+        while len(batch) < SEND_BATCH_MAX and not queue.empty():
+            batch.append(queue.get_nowait())
+        
+        by_session: Dict[str, List[_SendItem]] = {}
+        for item in batch:
+            by_session.setdefault(item[0], []).append(item)
+        
+        await asyncio.gather(*(_flush_sends(items) for items in by_session.values()))
+
+
+async def _flush_sends(items: List[_SendItem]) -> None:
+    global _session_snapshot
+    
+    # Drop sends whose caller has gone away (e.g. a cancelled timer)
+    items = [item for item in items if not item[2].done()]
+    if not items:
+        return
+    
+    futures = [future for _, _, future in items]
+    _sends_in_flight.update(futures)
+    try:
+        ok, output = await _run_tmux_chain(
+            [command for _, commands, _ in items for command in commands],
+            capture_output=False
+        )
+        result = (ok, "" if ok else output)
+    except Exception as e:
+        result = (False, str(e))
+    finally:
+        _sends_in_flight.difference_update(futures)
+    
+    if not result[0]:
+        # A failed send usually means a session went away; don't keep
+        # serving a session list that still contains it
+        _session_snapshot = None
+    
+    for future in futures:
+        if not future.done():
+            future.set_result(result)
+
 
 # --- Resources ---
 
@@ -44,36 +647,18 @@ active_cycles: Dict[str, asyncio.Task] = {}
 async def list_sessions_resource() -> str:
     """Get current tmux sessions as a resource"""
     try:
-        proc = await asyncio.create_subprocess_exec(
-            'tmux', 'list-sessions',
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, stderr = await proc.communicate()
+        sessions = await _list_sessions()
+        if sessions is None:
+            return _dumps({"error": "No tmux sessions found", "sessions": []})
         
-        if proc.returncode != 0:
-            return json.dumps({"error": "No tmux sessions found", "sessions": []})
-        
-        sessions = []
-        for line in stdout.decode().strip().split('\n'):
-            if line:
-                parts = line.split(':')
-                session_name = parts[0]
-                session_info = ':'.join(parts[1:]) if len(parts) > 1 else ""
-                sessions.append({
-                    "name": session_name,
-                    "info": session_info.strip(),
-                    "full_line": line
-                })
-        
-        return json.dumps({
-            "timestamp": datetime.now().isoformat(),
+        return _dumps({
+            "timestamp": _now_iso(),
             "count": len(sessions),
             "sessions": sessions
-        }, indent=2)
+        })
     except Exception as e:
         logger.error(f"Error listing sessions: {e}")
-        return json.dumps({"error": str(e), "sessions": []})
+        return _dumps({"error": str(e), "sessions": []})
 
 
 @mcp.resource("tmux://timers")
@@ -87,10 +672,10 @@ async def get_active_timers() -> str:
             "cancelled": task.cancelled()
         })
     
-    return json.dumps({
-        "timestamp": datetime.now().isoformat(),
+    return _dumps({
+        "timestamp": _now_iso(),
         "active_timers": timer_info
-    }, indent=2)
+    })
 
 
 @mcp.resource("tmux://cycles")
@@ -104,47 +689,30 @@ async def get_active_cycles() -> str:
             "cancelled": task.cancelled()
         })
     
-    return json.dumps({
-        "timestamp": datetime.now().isoformat(),
+    return _dumps({
+        "timestamp": _now_iso(),
         "active_cycles": cycle_info
-    }, indent=2)
+    })
 
 
 # --- Tools ---
 
 @mcp.tool()
-async def list_tmux_sessions(ctx: Context) -> List[Dict[str, str]]:
+async def list_tmux_sessions(ctx: Context) -> List[Dict[str, Any]]:
     """
     List all active tmux sessions
     
-    Returns a list of session information including name and details
+    Returns a list of sessions with their name, window count, number of
+    attached clients and creation time
     """
     await ctx.info("Listing tmux sessions")
     
     try:
-        proc = await asyncio.create_subprocess_exec(
-            'tmux', 'list-sessions',
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, stderr = await proc.communicate()
-        
-        if proc.returncode != 0:
+        sessions = await _list_sessions()
+        if sessions is None:
             await ctx.warning("No tmux sessions found")
             return []
         
-        sessions = []
-        for line in stdout.decode().strip().split('\n'):
-            if line:
-                parts = line.split(':')
-                session_name = parts[0]
-                session_info = ':'.join(parts[1:]) if len(parts) > 1 else ""
-                sessions.append({
-                    "name": session_name,
-                    "info": session_info.strip(),
-                    "full_line": line
-                })
-        
         await ctx.info(f"Found {len(sessions)} tmux sessions")
         return sessions
         
@@ -157,7 +725,8 @@ async def list_tmux_sessions(ctx: Context) -> List[Dict[str, str]]:
 async def send_message_to_session(
     session_name: str,
     message: str,
-    ctx: Context
+    ctx: Context,
+    enter_delay_seconds: float = 1
 ) -> Dict[str, Any]:
     """
     Send a message to a specific tmux session
@@ -167,42 +736,43 @@ async def send_message_to_session(
     Args:
         session_name: Name of the tmux session
         message: Message to send
+        enter_delay_seconds: Pause between typing and Enter (default: 1).
+            Use 0 to type and press Enter in a single tmux call.
     
     Returns success status and details
     """
     await ctx.info(f"Sending message to session '{session_name}': {message}")
     
     try:
-        # Send the message (just type it)
-        proc1 = await asyncio.create_subprocess_exec(
-            'tmux', 'send-keys', '-t', session_name, message,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        _, stderr1 = await proc1.communicate()
-        
-        if proc1.returncode != 0:
-            error_msg = stderr1.decode().strip()
-            await ctx.error(f"Failed to send message: {error_msg}")
-            return {"success": False, "error": error_msg}
+        _validate_session_name(session_name)
         
-        # Wait 1 second
-        await asyncio.sleep(1)
-        
-        # Send Enter key
-        proc2 = await asyncio.create_subprocess_exec(
-            'tmux', 'send-keys', '-t', session_name, 'Enter',
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        await proc2.communicate()
+        if enter_delay_seconds <= 0:
+            # Type the message and press Enter together
+            ok, error_msg = await _send_text(session_name, message, 'Enter')
+            
+            if not ok:
+                await ctx.error(f"Failed to send message: {error_msg}")
+                return {"success": False, "error": error_msg}
+        else:
+            # Send the message (just type it)
+            ok, error_msg = await _send_text(session_name, message)
+            
+            if not ok:
+                await ctx.error(f"Failed to send message: {error_msg}")
+                return {"success": False, "error": error_msg}
+            
+            # Give the target app time to take the input before Enter
+            await asyncio.sleep(enter_delay_seconds)
+            
+            # Send Enter key
+            await _send_keys(session_name, 'Enter')
         
         await ctx.info(f"Message sent successfully to '{session_name}'")
         return {
             "success": True,
             "session": session_name,
             "message": message,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": _now_iso()
         }
         
     except Exception as e:
@@ -227,11 +797,15 @@ async def start_message_timer(
     
     Returns timer status information
     """
-    global active_timers
+    try:
+        _validate_session_name(session_name)
+    except ValueError as e:
+        await ctx.error(str(e))
+        return {"success": False, "error": str(e)}
     
     # Stop existing timer for this session if any
     if session_name in active_timers:
-        active_timers[session_name].cancel()
+        await _cancel_task(active_timers.pop(session_name))
         await ctx.info(f"Cancelled existing timer for '{session_name}'")
     
     await ctx.info(f"Starting timer for '{session_name}' with {interval_seconds}s interval")
@@ -239,19 +813,8 @@ async def start_message_timer(
     async def timer_loop():
         while True:
             try:
-                # Send message
-                proc1 = await asyncio.create_subprocess_exec(
-                    'tmux', 'send-keys', '-t', session_name, message,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                await proc1.communicate()
-                
-                # Send Enter
-                proc2 = await asyncio.create_subprocess_exec(
-                    'tmux', 'send-keys', '-t', session_name, 'C-m',
-                    stderr=asyncio.subprocess.PIPE
-                )
-                await proc2.communicate()
+                # Type the message and press Enter in one send-keys call
+                await _send_text(session_name, message, 'C-m')
                 
                 await asyncio.sleep(interval_seconds)
             except asyncio.CancelledError:
@@ -261,8 +824,7 @@ async def start_message_timer(
                 break
     
     # Create and store the timer task
-    task = asyncio.create_task(timer_loop())
-    active_timers[session_name] = task
+    _track_task(active_timers, session_name, asyncio.create_task(timer_loop()))
     
     return {
         "success": True,
@@ -281,13 +843,14 @@ async def stop_message_timer(
     """
     Stop an active message timer for a tmux session
     
+    Waits up to a second for a send already in progress to finish; the
+    timer starts no new sends once this returns.
+    
     Args:
         session_name: Name of the tmux session
     
     Returns status information
     """
-    global active_timers
-    
     if session_name not in active_timers:
         await ctx.warning(f"No active timer for session '{session_name}'")
         return {
@@ -295,8 +858,7 @@ async def stop_message_timer(
             "error": f"No active timer for session '{session_name}'"
         }
     
-    active_timers[session_name].cancel()
-    del active_timers[session_name]
+    await _cancel_task(active_timers.pop(session_name))
     
     await ctx.info(f"Stopped timer for session '{session_name}'")
     return {
@@ -317,7 +879,7 @@ async def start_auto_cycle(
     Start auto exit/continue cycle for a tmux session
     
     This performs:
-    1. Send Ctrl+C 5 times (200ms apart)
+    1. Send Ctrl+C 5 times
     2. Wait 1 second
     3. Execute 'mullvad reconnect'
     4. Wait 3 seconds
@@ -331,57 +893,35 @@ async def start_auto_cycle(
     
     Returns cycle status information
     """
-    global active_cycles
+    try:
+        _validate_session_name(session_name)
+    except ValueError as e:
+        await ctx.error(str(e))
+        return {"success": False, "error": str(e)}
     
     # Stop existing cycle for this session if any
     if session_name in active_cycles:
-        active_cycles[session_name].cancel()
+        await _cancel_task(active_cycles.pop(session_name))
         await ctx.info(f"Cancelled existing cycle for '{session_name}'")
     
     await ctx.info(f"Starting auto-cycle for '{session_name}'")
     
     async def execute_sequence():
         """Execute the exit/continue sequence"""
-        # Send Ctrl+C 5 times
-        for i in range(5):
-            proc = await asyncio.create_subprocess_exec(
-                'tmux', 'send-keys', '-t', session_name, 'C-c',
-                stderr=asyncio.subprocess.PIPE
-            )
-            await proc.communicate()
-            await asyncio.sleep(0.2)
+        # Send Ctrl+C 5 times in one send-keys call
+        await _send_keys(session_name, *['C-c'] * 5)
         
         # Wait 1 second
         await asyncio.sleep(1)
         
         # Send mullvad reconnect
-        proc1 = await asyncio.create_subprocess_exec(
-            'tmux', 'send-keys', '-t', session_name, 'mullvad reconnect',
-            stderr=asyncio.subprocess.PIPE
-        )
-        await proc1.communicate()
-        
-        proc2 = await asyncio.create_subprocess_exec(
-            'tmux', 'send-keys', '-t', session_name, 'Enter',
-            stderr=asyncio.subprocess.PIPE
-        )
-        await proc2.communicate()
+        await _send_keys(session_name, 'mullvad reconnect', 'Enter')
         
         # Wait 3 seconds
         await asyncio.sleep(3)
         
         # Send claudex -c
-        proc3 = await asyncio.create_subprocess_exec(
-            'tmux', 'send-keys', '-t', session_name, 'claudex -c',
-            stderr=asyncio.subprocess.PIPE
-        )
-        await proc3.communicate()
-        
-        proc4 = await asyncio.create_subprocess_exec(
-            'tmux', 'send-keys', '-t', session_name, 'Enter',
-            stderr=asyncio.subprocess.PIPE
-        )
-        await proc4.communicate()
+        await _send_keys(session_name, 'claudex -c', 'Enter')
         
         await ctx.report_progress(
             progress=1.0,
@@ -405,8 +945,7 @@ async def start_auto_cycle(
                 break
     
     # Create and store the cycle task
-    task = asyncio.create_task(cycle_loop())
-    active_cycles[session_name] = task
+    _track_task(active_cycles, session_name, asyncio.create_task(cycle_loop()))
     
     return {
         "success": True,
@@ -425,13 +964,14 @@ async def stop_auto_cycle(
     """
     Stop an active auto-cycle for a tmux session
     
+    Waits up to a second for a send already in progress to finish; the
+    cycle starts no new sends once this returns.
+    
     Args:
         session_name: Name of the tmux session
     
     Returns status information
     """
-    global active_cycles
-    
     if session_name not in active_cycles:
         await ctx.warning(f"No active cycle for session '{session_name}'")
         return {
@@ -439,8 +979,7 @@ async def stop_auto_cycle(
             "error": f"No active cycle for session '{session_name}'"
         }
     
-    active_cycles[session_name].cancel()
-    del active_cycles[session_name]
+    await _cancel_task(active_cycles.pop(session_name))
     
     await ctx.info(f"Stopped auto-cycle for session '{session_name}'")
     return {
@@ -471,57 +1010,34 @@ async def launch_agent(
     
     Returns success status and details
     """
-    # Map agent names to commands
-    agent_commands = {
-        "gemini": "gemini",
-        "claude": "claude",
-        "codex": "codex",
-        "swarm": "swarmcode"
-    }
-    
     # Validate agent
-    if agent.lower() not in agent_commands:
-        await ctx.error(f"Unknown agent: {agent}. Supported: {', '.join(agent_commands.keys())}")
+    command = _AGENT_COMMANDS.get(agent.lower())
+    if command is None:
+        await ctx.error(f"Unknown agent: {agent}. Supported: {_AGENT_LIST_STR}")
         return {
             "success": False,
-            "error": f"Unknown agent: {agent}. Supported agents: gemini, claude, codex, swarm"
+            "error": f"Unknown agent: {agent}. Supported agents: {_AGENT_LIST_STR}"
         }
     
-    command = agent_commands[agent.lower()]
     await ctx.info(f"Launching {agent} in session '{session_name}' with command: {command}")
     
     try:
-        # Send the command to launch the agent
-        proc = await asyncio.create_subprocess_exec(
-            'tmux', 'send-keys', '-t', session_name, command,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        _, stderr = await proc.communicate()
+        _validate_session_name(session_name)
         
-        if proc.returncode != 0:
-            error_msg = stderr.decode().strip()
+        # Type the command and press Enter in a single send-keys call
+        ok, error_msg = await _send_keys(session_name, command, 'Enter')
+
+        if not ok:
             await ctx.error(f"Failed to launch {agent}: {error_msg}")
             return {"success": False, "error": error_msg}
-        
-        # Wait a moment
-        await asyncio.sleep(0.5)
-        
-        # Send Enter to execute
-        proc2 = await asyncio.create_subprocess_exec(
-            'tmux', 'send-keys', '-t', session_name, 'Enter',
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        await proc2.communicate()
-        
+
         await ctx.info(f"Successfully launched {agent} in '{session_name}'")
         return {
             "success": True,
             "agent": agent,
             "command": command,
             "session": session_name,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": _now_iso()
         }
         
     except Exception as e:
@@ -547,15 +1063,12 @@ async def send_ctrl_c(
     await ctx.info(f"Sending Ctrl+C {count} times to '{session_name}'")
     
     try:
+        _validate_session_name(session_name)
+        
         for i in range(count):
-            proc = await asyncio.create_subprocess_exec(
-                'tmux', 'send-keys', '-t', session_name, 'C-c',
-                stderr=asyncio.subprocess.PIPE
-            )
-            _, stderr = await proc.communicate()
+            ok, error_msg = await _send_keys(session_name, 'C-c')
             
-            if proc.returncode != 0:
-                error_msg = stderr.decode().strip()
+            if not ok:
                 await ctx.error(f"Failed to send Ctrl+C: {error_msg}")
                 return {"success": False, "error": error_msg, "sent": i}
             
@@ -6,6 +6,125 @@ import threading
 import time
 import os
 
+from tmux_commands import (
+    LISTBOX_SESSION_FORMAT, ControlReplyParser, control_mode_argv, control_session_name,
+    is_control_session, message_commands, tmux_chain_argv, tmux_command_line
+)
+
+# How long a list-sessions result is reused, in seconds
+SESSIONS_CACHE_TTL = 2.0
+
+# Minimum time between status bar redraws requested by worker threads, in ms
+STATUS_REFRESH_MS = 250
+
+def spawn_tmux(argv):
+    """
+    Run a tmux command line and wait for it, raising CalledProcessError on failure
+    
+    Uses posix_spawnp where available, which skips the pipe and Popen setup
+    subprocess.run does for every call.
+    """
+    if not hasattr(os, 'posix_spawnp'):
+        subprocess.run(argv, check=True)
+        return
+    
+    pid = os.posix_spawnp(argv[0], argv, os.environ)
+    _, status = os.waitpid(pid, 0)
+    returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, argv)
+
+class TmuxControl:
+    """
+    Persistent tmux control-mode (tmux -C) connection
+    
+    Commands are written one per line to the control client's stdin and tmux
+    answers each with a %begin ... %end (or %error) block, so sending keys
+    doesn't fork a new tmux client every time. The client attaches to a hidden
+    session that is killed once the connection closes (see control_mode_argv).
+    """
+    
+    SESSION_NAME = control_session_name("messenger")
+    
+    def __init__(self):
+        self.proc = None
+        # Timer and auto-cycle threads send concurrently
+        self.lock = threading.Lock()
+    
+    def run(self, commands):
+        """
+        Run tmux commands and return a (success, output) pair for each, or
+        None if control mode is unavailable and tmux should be spawned directly
+        
+        Commands left unanswered because the connection closed get None in
+        place of their pair; they are always the last ones.
+        """
+        # Control mode reads one command per line
+        if any('\n' in arg for command in commands for arg in command):
+            return None
+        
+        with self.lock:
+            if self.proc is None and not self._start():
+                return None
+            
+            try:
+                self.proc.stdin.write(''.join(tmux_command_line(command) for command in commands))
+                self.proc.stdin.flush()
+            except OSError:
+                # Nothing was sent, so the caller can safely retry another way
+                self._close()
+                return None
+            
+            results = []
+            for _ in commands:
+                try:
+                    results.append(self._read_reply())
+                except (OSError, EOFError):
+                    self._close()
+                    results.append(None)
+            return results
+    
+    def close(self):
+        with self.lock:
+            self._close()
+    
+    def _start(self):
+        try:
+            self.proc = subprocess.Popen(
+                control_mode_argv(self.SESSION_NAME),
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                text=True, errors='replace'
+            )
+        except OSError:
+            return False
+        return True
+    
+    def _read_reply(self):
+        if self.proc is None:
+            raise EOFError
+        
+        parser = ControlReplyParser()
+        while True:
+            line = self.proc.stdout.readline()
+            if not line:
+                raise EOFError
+            
+            reply = parser.feed(line.rstrip('\n'))
+            if reply is not None:
+                return reply
+    
+    def _close(self):
+        proc, self.proc = self.proc, None
+        if proc is None:
+            return
+        try:
+            # tmux -C exits when its stdin closes
+            proc.stdin.close()
+            proc.wait(timeout=1)
+        except (OSError, subprocess.TimeoutExpired):
+            proc.kill()
+            proc.wait()
+
 class TmuxMessenger:
     def __init__(self, root):
         self.root = root
@@ -16,7 +135,19 @@ class TmuxMessenger:
         self.timer_thread = None
         self.auto_cycle_active = False
         self.auto_cycle_thread = None
+        # Set to wake the worker threads when they should stop
+        self._timer_stop = threading.Event()
+        self._auto_stop = threading.Event()
         self.first_launch = True
+        # (monotonic timestamp, sessions) from the last list-sessions call
+        self._sessions_cache = (0.0, [])
+        self.tmux_control = TmuxControl()
+        # Latest status text from worker threads and whether a redraw is queued
+        self._pending_status = None
+        self._status_scheduled = False
+        # Errors already shown in a dialog since the last start; repeats only
+        # go to the status bar so a failing timer can't stack up dialogs
+        self._shown_errors = set()
         
         self.setup_ui()
         self.refresh_sessions()
@@ -93,20 +224,51 @@ class TmuxMessenger:
         self.root.columnconfigure(0, weight=1)
         self.root.rowconfigure(0, weight=1)
     
+    def set_status(self, text):
+        """Show text in the status bar from a worker thread, redrawing at most every STATUS_REFRESH_MS"""
+        self._pending_status = text
+        if not self._status_scheduled:
+            self._status_scheduled = True
+            self.root.after(STATUS_REFRESH_MS, self._flush_status)
+    
+    def _flush_status(self):
+        # Clear the flag first so text set while we redraw queues a new redraw
+        self._status_scheduled = False
+        text, self._pending_status = self._pending_status, None
+        if text is not None:
+            self.status_label.config(text=text)
+    
+    def report_error(self, key, text):
+        """Show an error dialog the first time key is reported, the status bar after that (any thread)"""
+        if key in self._shown_errors:
+            self.set_status(text)
+            return
+        
+        self._shown_errors.add(key)
+        self.root.after(0, lambda: messagebox.showerror("Error", text))
+    
     def get_tmux_sessions(self):
+        # Reuse a recent listing so bursts of refreshes share one tmux call
+        cached_at, cached = self._sessions_cache
+        if time.monotonic() - cached_at < SESSIONS_CACHE_TTL:
+            return cached
+        
         try:
-            result = subprocess.run(['tmux', 'list-sessions'], capture_output=True, text=True, check=True)
+            result = subprocess.run(['tmux', 'list-sessions', '-F', LISTBOX_SESSION_FORMAT], capture_output=True, text=True, check=True)
             sessions = []
             for line in result.stdout.strip().split('\n'):
                 if line:
-                    session_name = line.split(':')[0]
-                    sessions.append((session_name, line))
-            return sessions
+                    session_name, _, session_info = line.partition('\t')
+                    if not is_control_session(session_name):
+                        sessions.append((session_name, session_info))
         except subprocess.CalledProcessError:
-            return []
+            sessions = []
         except FileNotFoundError:
             messagebox.showerror("Error", "tmux not found. Please install tmux.")
             return []
+        
+        self._sessions_cache = (time.monotonic(), sessions)
+        return sessions
     
     def refresh_sessions(self):
         self.sessions_listbox.delete(0, tk.END)
@@ -116,8 +278,8 @@ class TmuxMessenger:
             self.sessions_listbox.insert(tk.END, "No tmux sessions found")
             self.status_label.config(text="No sessions available")
         else:
-            for session_name, session_info in sessions:
-                self.sessions_listbox.insert(tk.END, session_info)
+            # One Tcl call for the whole list
+            self.sessions_listbox.insert(tk.END, *(session_info for session_name, session_info in sessions))
             self.status_label.config(text=f"Found {len(sessions)} sessions")
     
     def get_selected_session(self):
@@ -131,20 +293,39 @@ class TmuxMessenger:
             messagebox.showwarning("Warning", "No valid session selected")
             return None
         
-        return session_line.split(':')[0]
+        return session_line.partition(':')[0]
+    
+    def run_tmux(self, *commands):
+        """
+        Run tmux commands (tuples of arguments), over the control connection
+        when it is available
+        
+        Raises CalledProcessError (with tmux's message in stderr, if known)
+        for the first command that fails.
+        """
+        results = [result for result in self.tmux_control.run(commands) or () if result is not None]
+        for command, (ok, output) in zip(commands, results):
+            if not ok:
+                raise subprocess.CalledProcessError(1, ('tmux',) + command, stderr=output)
+        
+        # Control mode is unavailable, or the connection closed before the
+        # remaining commands were answered
+        if len(results) < len(commands):
+            spawn_tmux(tmux_chain_argv(commands[len(results):]))
     
     def send_message_to_session(self, session_name, message):
         try:
-            # Send the message using tmux send-keys
-            subprocess.run(['tmux', 'send-keys', '-t', session_name, message], check=True)
-            # Send Enter key using C-m (carriage return)
-            subprocess.run(['tmux', 'send-keys', '-t', session_name, 'C-m'], check=True)
+            # Type the message literally, then send Enter using C-m (carriage return)
+            self.run_tmux(*message_commands(session_name, message))
             return True
         except subprocess.CalledProcessError as e:
-            messagebox.showerror("Error", f"Failed to send message to session '{session_name}': {e}")
+            # The session may be gone; make the next listing hit tmux again
+            self._sessions_cache = (0.0, [])
+            error = e.stderr or str(e)
+            self.report_error(('send', session_name, error), f"Failed to send message to session '{session_name}': {error}")
             return False
         except FileNotFoundError:
-            messagebox.showerror("Error", "tmux not found")
+            self.report_error(('tmux',), "tmux not found")
             return False
     
     def send_once(self):
@@ -157,6 +338,7 @@ class TmuxMessenger:
             messagebox.showwarning("Warning", "Please enter a message to send")
             return
         
+        self._shown_errors.clear()
         if self.send_message_to_session(session_name, message):
             self.status_label.config(text=f"Message sent to '{session_name}'")
     
@@ -179,22 +361,22 @@ class TmuxMessenger:
             return
         
         self.timer_active = True
+        self._shown_errors.clear()
+        # A fresh event per run, so a previous worker still finishing a send
+        # keeps seeing its own stop signal
+        self._timer_stop = stop = threading.Event()
         self.start_timer_btn.config(state="disabled")
         self.stop_timer_btn.config(state="normal")
         self.send_once_btn.config(state="disabled")
         
         def timer_loop():
-            while self.timer_active:
-                if self.send_message_to_session(session_name, message):
-                    self.root.after(0, lambda: self.status_label.config(
-                        text=f"Timer active - Last sent to '{session_name}' at {time.strftime('%H:%M:%S')}"
-                    ))
+            while not stop.is_set():
+                if self.send_message_to_session(session_name, message) and not stop.is_set():
+                    self.set_status(f"Timer active - Last sent to '{session_name}' at {time.strftime('%H:%M:%S')}")
                 
-                # Wait for the specified interval, but check every 0.1 seconds if we should stop
-                elapsed = 0
-                while elapsed < interval and self.timer_active:
-                    time.sleep(0.1)
-                    elapsed += 0.1
+                # Wait for the specified interval, returning early if stopped
+                if stop.wait(interval):
+                    break
         
         self.timer_thread = threading.Thread(target=timer_loop, daemon=True)
         self.timer_thread.start()
@@ -203,41 +385,41 @@ class TmuxMessenger:
     
     def stop_timer(self):
         self.timer_active = False
-        if self.timer_thread:
-            self.timer_thread.join(timeout=1)
+        # The worker wakes from its wait and exits on its own; it is a daemon
+        # thread, so there's no need to block the UI joining it
+        self._timer_stop.set()
         
         self.start_timer_btn.config(state="normal")
         self.stop_timer_btn.config(state="disabled")
         self.send_once_btn.config(state="normal")
+        # Drop a queued worker update so it can't overwrite this
+        self._pending_status = None
         self.status_label.config(text="Timer stopped")
     
     def send_exit_continue_sequence(self, session_name):
         try:
-            # Send Ctrl+C 5 times for robust termination
-            for i in range(5):
-                subprocess.run(['tmux', 'send-keys', '-t', session_name, 'C-c'], check=True)
-                time.sleep(0.2)
+            # Send Ctrl+C 5 times for robust termination, as one tmux command
+            self.run_tmux(('send-keys', '-t', session_name) + ('C-c',) * 5)
             
             # Wait 1 second
             time.sleep(1)
             
             # Send mullvad reconnect
-            subprocess.run(['tmux', 'send-keys', '-t', session_name, 'mullvad reconnect'], check=True)
-            subprocess.run(['tmux', 'send-keys', '-t', session_name, 'Enter'], check=True)
+            self.run_tmux(('send-keys', '-t', session_name, 'mullvad reconnect', 'Enter'))
             
             # Wait 3 seconds for mullvad to reconnect
             time.sleep(3)
             
             # Send claudex -c
-            subprocess.run(['tmux', 'send-keys', '-t', session_name, 'claudex -c'], check=True)
-            subprocess.run(['tmux', 'send-keys', '-t', session_name, 'Enter'], check=True)
+            self.run_tmux(('send-keys', '-t', session_name, 'claudex -c', 'Enter'))
             
             return True
         except subprocess.CalledProcessError as e:
-            self.root.after(0, lambda: messagebox.showerror("Error", f"Failed to send exit/continue sequence to session '{session_name}': {e}"))
+            error = e.stderr or str(e)
+            self.report_error(('sequence', session_name, error), f"Failed to send exit/continue sequence to session '{session_name}': {error}")
             return False
         except FileNotFoundError:
-            self.root.after(0, lambda: messagebox.showerror("Error", "tmux not found"))
+            self.report_error(('tmux',), "tmux not found")
             return False
     
     def start_auto_cycle(self):
@@ -246,6 +428,8 @@ class TmuxMessenger:
             return
         
         self.auto_cycle_active = True
+        self._shown_errors.clear()
+        self._auto_stop = stop = threading.Event()
         self.start_auto_btn.config(state="disabled")
         self.stop_auto_btn.config(state="normal")
         self.start_timer_btn.config(state="disabled")
@@ -255,24 +439,13 @@ class TmuxMessenger:
             # If this is the first launch, start immediately
             if self.first_launch:
                 self.first_launch = False
-                if self.send_exit_continue_sequence(session_name):
-                    self.root.after(0, lambda: self.status_label.config(
-                        text=f"Auto cycle active - First sequence sent to '{session_name}' at {time.strftime('%H:%M:%S')}"
-                    ))
+                if self.send_exit_continue_sequence(session_name) and not stop.is_set():
+                    self.set_status(f"Auto cycle active - First sequence sent to '{session_name}' at {time.strftime('%H:%M:%S')}")
             
-            # Then continue with 4-minute intervals
-            while self.auto_cycle_active:
-                # Wait for 4 minutes (240 seconds), checking every 0.5 seconds if we should stop
-                elapsed = 0
-                while elapsed < 240 and self.auto_cycle_active:
-                    time.sleep(0.5)
-                    elapsed += 0.5
-                
-                if self.auto_cycle_active:
-                    if self.send_exit_continue_sequence(session_name):
-                        self.root.after(0, lambda: self.status_label.config(
-                            text=f"Auto cycle active - Last sequence sent to '{session_name}' at {time.strftime('%H:%M:%S')}"
-                        ))
+            # Then continue with 4-minute intervals; wait() returns True once stopped
+            while not stop.wait(240):
+                if self.send_exit_continue_sequence(session_name) and not stop.is_set():
+                    self.set_status(f"Auto cycle active - Last sequence sent to '{session_name}' at {time.strftime('%H:%M:%S')}")
         
         self.auto_cycle_thread = threading.Thread(target=auto_cycle_loop, daemon=True)
         self.auto_cycle_thread.start()
@@ -281,13 +454,13 @@ class TmuxMessenger:
     
     def stop_auto_cycle(self):
         self.auto_cycle_active = False
-        if self.auto_cycle_thread:
-            self.auto_cycle_thread.join(timeout=1)
+        self._auto_stop.set()
         
         self.start_auto_btn.config(state="normal")
         self.stop_auto_btn.config(state="disabled")
         self.start_timer_btn.config(state="normal")
         self.send_once_btn.config(state="normal")
+        self._pending_status = None
         self.status_label.config(text="Auto cycle stopped")
 
 def main():
@@ -299,6 +472,7 @@ def main():
             app.stop_timer()
         if app.auto_cycle_active:
             app.stop_auto_cycle()
+        app.tmux_control.close()
         root.destroy()
     
     root.protocol("WM_DELETE_WINDOW", on_closing)
@@ -5,7 +5,9 @@ import pyuv
 import signal
 import os
 import time
-import functools
+import math
+
+from tmux_commands import LISTBOX_SESSION_FORMAT, is_control_session, message_commands, tmux_chain_argv
 
 class TmuxMessengerUV:
     def __init__(self, root):
@@ -20,21 +22,64 @@ class TmuxMessengerUV:
         self.first_launch = True
         
         self.setup_ui()
-        self.refresh_sessions()
         
         # Setup UV loop integration with Tkinter
         self.setup_uv_integration()
+        self.refresh_sessions()
     
     def setup_uv_integration(self):
         """Integrate UV event loop with Tkinter main loop"""
-        def run_uv_loop():
-            # Run UV loop in non-blocking mode
-            self.loop.run(pyuv.UV_RUN_NOWAIT)
-            # Schedule next UV loop iteration
-            self.root.after(10, run_uv_loop)
+        self.uv_after_id = None
+        try:
+            # Let Tk's own select() wake us when the loop's backend fd has
+            # I/O ready, instead of polling it
+            self.uv_fd = self.loop.fileno()
+            self.root.tk.createfilehandler(self.uv_fd, tk.READABLE, lambda fd, mask: self.run_uv_loop())
+        except (AttributeError, ValueError, OSError):
+            # File handlers aren't available on Windows; poll every 10ms
+            # while the loop has work
+            self.uv_fd = None
         
         # Start UV loop integration
-        self.root.after(10, run_uv_loop)
+        self.schedule_uv_loop(0)
+    
+    def run_uv_loop(self):
+        # Run UV loop in non-blocking mode
+        self.loop.run(pyuv.UV_RUN_NOWAIT)
+        self.schedule_uv_loop()
+    
+    def schedule_uv_loop(self, delay=None):
+        """
+        Schedule the next UV loop iteration, by default at the next timer deadline
+        
+        Nothing is scheduled while the loop has no active handles; code that
+        starts UV work calls this with a delay of 0 to wake it up again.
+        """
+        if self.uv_after_id is not None:
+            self.root.after_cancel(self.uv_after_id)
+            self.uv_after_id = None
+        
+        if delay is None:
+            if not self.loop.alive:
+                # get_timeout() reports 0 for an idle loop, which would spin
+                return
+            if self.uv_fd is None:
+                delay = 10
+            else:
+                # Expired libuv timers don't make the fd readable. get_timeout()
+                # is in seconds (-0.001 for no timers); after() needs whole ms
+                delay = int(math.ceil(self.loop.get_timeout() * 1000))
+                if delay < 0:
+                    return
+        self.uv_after_id = self.root.after(delay, self.run_uv_loop)
+    
+    def stop_uv_integration(self):
+        if self.uv_after_id is not None:
+            self.root.after_cancel(self.uv_after_id)
+            self.uv_after_id = None
+        if self.uv_fd is not None:
+            self.root.tk.deletefilehandler(self.uv_fd)
+            self.uv_fd = None
     
     def setup_ui(self):
         # Main frame
@@ -108,22 +153,65 @@ class TmuxMessengerUV:
         self.root.columnconfigure(0, weight=1)
         self.root.rowconfigure(0, weight=1)
     
-    def get_tmux_sessions(self):
-        """Get tmux sessions using UV process spawning"""
-        sessions = []
-        output_data = []
+    def spawn_tmux(self, args, exit_callback=None, stdio=None):
+        """
+        Spawn tmux on the UV loop, returning the process or None if it couldn't be started
         
+        libuv process handles can't be respawned, so each call gets a new one,
+        closed as soon as the process exits. exit_callback receives the exit status.
+        """
         def on_exit(proc, exit_status, term_signal):
-            if exit_status == 0:
-                output = ''.join(output_data)
+            proc.close()
+            if exit_callback:
+                exit_callback(exit_status)
+        
+        kwargs = {"stdio": stdio} if stdio is not None else {}
+        try:
+            return pyuv.Process.spawn(self.loop, args=args, exit_callback=on_exit, **kwargs)
+        except pyuv.error.ProcessError:
+            # tmux not found
+            return None
+    
+    def get_tmux_sessions(self, callback):
+        """
+        Get tmux sessions using UV process spawning
+        
+        Returns immediately; callback receives the sessions once tmux has
+        exited and its output has been read.
+        """
+        # Raw stdout, decoded once tmux is done
+        output_data = bytearray()
+        exit_code = [None]
+        # Process exit and stdout EOF can arrive in either order
+        pending = [2]
+        
+        def finish():
+            pending[0] -= 1
+            if pending[0]:
+                return
+            
+            sessions = []
+            if exit_code[0] == 0:
+                output = output_data.decode('utf-8', 'replace')
                 for line in output.strip().split('\n'):
                     if line:
-                        session_name = line.split(':')[0]
-                        sessions.append((session_name, line))
+                        session_name, _, session_info = line.partition('\t')
+                        # Leave out the hidden sessions of control-mode clients
+                        if not is_control_session(session_name):
+                            sessions.append((session_name, session_info))
+            callback(sessions)
+        
+        def on_exit(exit_status):
+            exit_code[0] = exit_status
+            finish()
         
         def on_read(handle, data, error):
             if data:
-                output_data.append(data.decode('utf-8'))
+                output_data.extend(data)
+            elif error is not None:
+                # EOF (or a read error): tmux has closed its stdout
+                handle.close()
+                finish()
         
         # Create pipes for stdout
         stdout_pipe = pyuv.Pipe(self.loop)
@@ -135,32 +223,29 @@ class TmuxMessengerUV:
         stdio.append(pyuv.StdIO(flags=pyuv.UV_IGNORE))  # stderr
         
         # Spawn process
-        proc = pyuv.Process(self.loop)
-        proc.spawn(
-            file="tmux",
-            args=["tmux", "list-sessions"],
-            stdio=stdio,
-            exit_callback=on_exit
-        )
+        if self.spawn_tmux(["tmux", "list-sessions", "-F", LISTBOX_SESSION_FORMAT], on_exit, stdio) is None:
+            stdout_pipe.close()
+            callback([])
+            return
         
         # Start reading from stdout
         stdout_pipe.start_read(on_read)
-        
-        # Run the loop to complete the operation
-        self.loop.run(pyuv.UV_RUN_DEFAULT)
-        
-        return sessions
     
     def refresh_sessions(self):
+        # The UV loop integration drives the spawn; the listbox is filled
+        # when tmux exits, so the UI never blocks on it
+        self.get_tmux_sessions(self.populate_sessions)
+        self.schedule_uv_loop(0)
+    
+    def populate_sessions(self, sessions):
         self.sessions_listbox.delete(0, tk.END)
-        sessions = self.get_tmux_sessions()
         
         if not sessions:
             self.sessions_listbox.insert(tk.END, "No tmux sessions found")
             self.status_label.config(text="No sessions available")
         else:
-            for session_name, session_info in sessions:
-                self.sessions_listbox.insert(tk.END, session_info)
+            # One Tcl call for the whole list
+            self.sessions_listbox.insert(tk.END, *(session_info for session_name, session_info in sessions))
             self.status_label.config(text=f"Found {len(sessions)} sessions")
     
     def get_selected_session(self):
@@ -174,29 +259,17 @@ class TmuxMessengerUV:
             messagebox.showwarning("Warning", "No valid session selected")
             return None
         
-        return session_line.split(':')[0]
+        return session_line.partition(':')[0]
     
     def send_message_to_session_uv(self, session_name, message, callback=None):
         """Send message to tmux session using UV process spawning"""
-        def on_exit(proc, exit_status, term_signal):
+        def on_exit(exit_status):
             if callback:
                 callback(exit_status == 0)
         
-        # First send the message
-        proc1 = pyuv.Process(self.loop)
-        proc1.spawn(
-            file="tmux",
-            args=["tmux", "send-keys", "-t", session_name, message],
-            exit_callback=lambda p, s, t: None
-        )
-        
-        # Then send Enter key
-        proc2 = pyuv.Process(self.loop)
-        proc2.spawn(
-            file="tmux",
-            args=["tmux", "send-keys", "-t", session_name, "C-m"],
-            exit_callback=on_exit
-        )
+        # Type the message literally, then send Enter (C-m), in one tmux call
+        if self.spawn_tmux(tmux_chain_argv(message_commands(session_name, message)), on_exit) is None and callback:
+            callback(False)
     
     def send_once(self):
         session_name = self.get_selected_session()
@@ -215,6 +288,8 @@ class TmuxMessengerUV:
                 messagebox.showerror("Error", f"Failed to send message to session '{session_name}'")
         
         self.send_message_to_session_uv(session_name, message, on_sent)
+        # Run the loop once so libuv starts watching the new process
+        self.schedule_uv_loop(0)
     
     def start_timer(self):
         session_name = self.get_selected_session()
@@ -247,12 +322,15 @@ class TmuxMessengerUV:
         # Create and start UV timer
         self.timer_handle = pyuv.Timer(self.loop)
         self.timer_handle.start(timer_callback, interval, interval)
+        self.schedule_uv_loop(0)
         
         self.status_label.config(text=f"Timer started - sending every {interval}s to '{session_name}'")
     
     def stop_timer(self):
         if self.timer_handle:
-            self.timer_handle.stop()
+            # close() stops the timer and frees the handle; a new one is
+            # created on the next start
+            self.timer_handle.close()
             self.timer_handle = None
         
         self.start_timer_btn.config(state="normal")
@@ -262,73 +340,32 @@ class TmuxMessengerUV:
     
     def send_exit_continue_sequence_uv(self, session_name, callback=None):
         """Send exit/continue sequence using UV"""
-        sequence_step = [0]
+        def send_keys(*keys):
+            self.spawn_tmux(["tmux", "send-keys", "-t", session_name] + list(keys))
+        
+        def send_claudex(timer_handle):
+            timer_handle.close()
+            # Send claudex -c
+            send_keys("claudex -c", "Enter")
+            
+            if callback:
+                callback(True)
         
-        def next_step(timer_handle=None):
-            step = sequence_step[0]
+        def send_mullvad(timer_handle):
+            timer_handle.close()
+            # Send mullvad reconnect
+            send_keys("mullvad reconnect", "Enter")
             
-            if step < 5:
-                # Send Ctrl+C
-                proc = pyuv.Process(self.loop)
-                proc.spawn(
-                    file="tmux",
-                    args=["tmux", "send-keys", "-t", session_name, "C-c"],
-                    exit_callback=lambda p, s, t: None
-                )
-                sequence_step[0] += 1
-                
-                # Schedule next Ctrl+C after 200ms
-                timer = pyuv.Timer(self.loop)
-                timer.start(next_step, 0.2, 0)
-                
-            elif step == 5:
-                # Wait 1 second then send mullvad reconnect
-                sequence_step[0] += 1
-                timer = pyuv.Timer(self.loop)
-                timer.start(next_step, 1.0, 0)
-                
-            elif step == 6:
-                # Send mullvad reconnect
-                proc1 = pyuv.Process(self.loop)
-                proc1.spawn(
-                    file="tmux",
-                    args=["tmux", "send-keys", "-t", session_name, "mullvad reconnect"],
-                    exit_callback=lambda p, s, t: None
-                )
-                
-                proc2 = pyuv.Process(self.loop)
-                proc2.spawn(
-                    file="tmux",
-                    args=["tmux", "send-keys", "-t", session_name, "Enter"],
-                    exit_callback=lambda p, s, t: None
-                )
-                
-                sequence_step[0] += 1
-                # Wait 3 seconds for mullvad to reconnect
-                timer = pyuv.Timer(self.loop)
-                timer.start(next_step, 3.0, 0)
-                
-            elif step == 7:
-                # Send claudex -c
-                proc1 = pyuv.Process(self.loop)
-                proc1.spawn(
-                    file="tmux",
-                    args=["tmux", "send-keys", "-t", session_name, "claudex -c"],
-                    exit_callback=lambda p, s, t: None
-                )
-                
-                proc2 = pyuv.Process(self.loop)
-                proc2.spawn(
-                    file="tmux",
-                    args=["tmux", "send-keys", "-t", session_name, "Enter"],
-                    exit_callback=lambda p, s, t: None
-                )
-                
-                if callback:
-                    callback(True)
-        
-        # Start the sequence
-        next_step()
+            # Wait 3 seconds for mullvad to reconnect
+            timer = pyuv.Timer(self.loop)
+            timer.start(send_claudex, 3.0, 0)
+        
+        # Send Ctrl+C 5 times in a single tmux call
+        send_keys(*["C-c"] * 5)
+        
+        # Wait 1 second then send mullvad reconnect
+        timer = pyuv.Timer(self.loop)
+        timer.start(send_mullvad, 1.0, 0)
     
     def start_auto_cycle(self):
         session_name = self.get_selected_session()
@@ -354,12 +391,13 @@ class TmuxMessengerUV:
         # Create and start UV timer for 4-minute intervals
         self.auto_cycle_handle = pyuv.Timer(self.loop)
         self.auto_cycle_handle.start(auto_cycle_callback, 240.0, 240.0)  # 240 seconds = 4 minutes
+        self.schedule_uv_loop(0)
         
         self.status_label.config(text=f"Auto cycle started - Ctrl+C spam + mullvad reconnect + claudex -c every 4 minutes to '{session_name}'")
     
     def stop_auto_cycle(self):
         if self.auto_cycle_handle:
-            self.auto_cycle_handle.stop()
+            self.auto_cycle_handle.close()
             self.auto_cycle_handle = None
         
         self.start_auto_btn.config(state="normal")
@@ -378,6 +416,7 @@ def main():
         if app.auto_cycle_handle:
             app.stop_auto_cycle()
         # Stop UV loop
+        app.stop_uv_integration()
         app.loop.stop()
         root.destroy()
     